@@ -1,39 +1,135 @@
 
-import os, re, requests, textwrap
-from typing import Dict, Callable
+import os, json, time, shutil, tempfile, hashlib, requests, textwrap, contextlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Callable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", "<PUT_YOUR_KEY_HERE>")
 
+# orjson (optional) parses the tool API payloads straight from the response bytes,
+# several times faster than r.json(); the stdlib json accepts the same bytes.
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 WIKI_HEADERS = {"User-Agent": "react-agent-demo/1.0"}
 
+# One keep-alive session for every tool call, so repeat Wikipedia/OpenWeather
+# hits reuse the pooled TCP+TLS connection instead of re-handshaking.
+_SESSION = requests.Session()
+# Transient 429/5xx responses are retried here with exponential backoff (honouring
+# Retry-After), so the agent never spends a reasoning turn on a flaky endpoint.
+# raise_on_status=False hands the last response back, keeping the tools' error strings.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET"]),
+    raise_on_status=False,
+)
+_SESSION.mount("https://", HTTPAdapter(max_retries=_RETRY, pool_connections=8, pool_maxsize=16))
+_SESSION.headers.update(WIKI_HEADERS)
+
+CACHE_DIR = Path(__file__).parent / ".cache"
+WIKI_CACHE_TTL = 60 * 60       # summaries change rarely
+WEATHER_CACHE_TTL = 5 * 60     # weather is only good for a few minutes
+
+_CACHE: Dict[Tuple[str, str], Tuple[float, str]] = {}
+
+def _cache_path(namespace: str, key: str) -> Path:
+    return CACHE_DIR / namespace / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+def cache_get(namespace: str, key: str, ttl: float) -> Optional[str]:
+    """
+    Return a cached tool result younger than `ttl` seconds, or None.
+    Looks in process memory first, then in the on-disk cache so repeat CLI runs also hit.
+    """
+    entry = _CACHE.get((namespace, key))
+    if entry is None:
+        try:
+            stored_at, value = json.loads(_cache_path(namespace, key).read_text(encoding="utf-8"))
+            entry = (float(stored_at), value)
+        except (OSError, ValueError, TypeError):
+            return None  # missing, torn or foreign file: treat as a miss
+        if not isinstance(value, str):
+            return None
+        _CACHE[(namespace, key)] = entry
+    stored_at, value = entry
+    if time.time() - stored_at > ttl:
+        return None
+    return value
+
+def cache_set(namespace: str, key: str, value: str) -> None:
+    entry = (time.time(), value)
+    _CACHE[(namespace, key)] = entry
+    path = _cache_path(namespace, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write a private temp file and rename it over the entry, so a concurrent
+    # writer or reader never sees a half-written file.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(entry))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def clear_cache() -> None:
+    _CACHE.clear()
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
 def wikipedia_summary(topic: str) -> str:
-    """Use Wikipedia REST API /page/summary/{title} to get concise factual summary."""
+    """Use Wikipedia REST API /page/summary/{title} to get concise factual summary (cached per topic)."""
+    topic = topic.strip()
+    key = topic.lower()
+    cached = cache_get("wiki", key, WIKI_CACHE_TTL)
+    if cached is not None:
+        return cached
     url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic}"
-    r = requests.get(url, headers=WIKI_HEADERS, timeout=10)
+    r = _SESSION.get(url, timeout=10)
     if r.status_code != 200:
         return f"[wiki] error {r.status_code}: {r.text[:200]}"
-    d = r.json()
-    return f"{d.get('title','')} — {d.get('description','')}\n{d.get('extract','')}"
+    d = _loads(r.content)
+    summary = f"{d.get('title','')} — {d.get('description','')}\n{d.get('extract','')}"
+    cache_set("wiki", key, summary)
+    return summary
 
 def weather_brief(latlon: str) -> str:
-    """OpenWeather current weather snapshot for lat,lon. Needs OPENWEATHER_API_KEY on env."""
+    """OpenWeather current weather snapshot for lat,lon. Needs OPENWEATHER_API_KEY on env. Cached for a few minutes."""
     if OPENWEATHER_API_KEY.startswith("<PUT_"):
         return "[weather] Please set OPENWEATHER_API_KEY"
     lat, lon = [float(x.strip()) for x in latlon.split(",")]
+    key = f"{lat},{lon}"
+    cached = cache_get("weather", key, WEATHER_CACHE_TTL)
+    if cached is not None:
+        return cached
     url = "https://api.openweathermap.org/data/2.5/weather"
     params = {"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY}
-    r = requests.get(url, params=params, timeout=10)
+    r = _SESSION.get(url, params=params, timeout=10)
     if r.status_code != 200:
         return f"[weather] error {r.status_code}: {r.text[:200]}"
-    d = r.json()
+    d = _loads(r.content)
     k2c = lambda k: round(k - 273.15, 1)
     desc = d["weather"][0]["description"]
     temp_c = k2c(d["main"]["temp"])
-    return f"{desc}, {temp_c}°C"
+    brief = f"{desc}, {temp_c}°C"
+    cache_set("weather", key, brief)
+    return brief
 
 def corporate_hotel(city: str) -> str:
     """Stub for travel policy."""
-    if city.lower() == "hyderabad":
+    return _corporate_hotel(city.strip().lower())
+
+@lru_cache(maxsize=256)
+def _corporate_hotel(city: str) -> str:
+    # keyed on the normalized city, so "Hyderabad" and " hyderabad" share one entry
+    if city == "hyderabad":
         return (
             "MetroLink Executive Suites (~₹5400/night). "
             "5-10 min to Hitech City. Breakfast, meeting room, gym. "
@@ -47,6 +143,35 @@ TOOLS: Dict[str, Callable[[str], str]] = {
     "corporate_hotel": corporate_hotel,
 }
 
+# Trace steps and the final-answer template are dedented once at import,
+# not on every react_demo call.
+_STEP1 = textwrap.dedent("""
+Thought: The user is asking about an executive-suitable hotel near Hitech City in Hyderabad and weather/packing tips.
+Thought: I should gather factual context about Hyderabad first.
+Action: wikipedia_summary
+Action Input: Hyderabad
+""").strip()
+
+_STEP2 = textwrap.dedent("""
+Thought: I should get current weather so I can advise packing.
+Action: weather_brief
+Action Input: 17.44,78.38
+""").strip()
+
+_STEP3 = textwrap.dedent("""
+Thought: I should retrieve a policy-approved executive hotel near Hitech City.
+Action: corporate_hotel
+Action Input: Hyderabad
+""").strip()
+
+_FINAL_ANSWER_TMPL = textwrap.dedent("""
+Final Answer: Hyderabad is a major Indian tech/business hub centered around Hitech City.
+Recommended stay: {hotel}
+Weather right now: {weather}
+Guidance: Stay within ~10 min of Hitech City to cut transit risk. Pack for actual conditions.
+Mention the approved property in your expense note to avoid reimbursement issues.
+""").strip()
+
 def react_demo(user_query: str):
     """
     Offline simulation of a ReAct loop.
@@ -56,55 +181,38 @@ def react_demo(user_query: str):
 
     trace = []
 
-    # Step 1
-    step1 = textwrap.dedent(f"""
-    Thought: The user is asking about an executive-suitable hotel near Hitech City in Hyderabad and weather/packing tips.
-    Thought: I should gather factual context about Hyderabad first.
-    Action: wikipedia_summary
-    Action Input: Hyderabad
-    """).strip()
-    trace.append(step1)
-    obs1 = wikipedia_summary("Hyderabad")
-    trace.append(f"Observation: {obs1}")
+    # The three actions have no data dependency on each other, so run them
+    # concurrently: wall time is the slowest call, not the sum of all three.
+    with ThreadPoolExecutor(max_workers=3) as ex:
+        f1 = ex.submit(wikipedia_summary, "Hyderabad")
+        f2 = ex.submit(weather_brief, "17.44,78.38")
+        f3 = ex.submit(corporate_hotel, "Hyderabad")
+        obs1, obs2, obs3 = f1.result(), f2.result(), f3.result()
 
-    # Step 2
-    step2 = textwrap.dedent(f"""
-    Thought: I should get current weather so I can advise packing.
-    Action: weather_brief
-    Action Input: 17.44,78.38
-    """).strip()
-    trace.append(step2)
-    obs2 = weather_brief("17.44,78.38")
+    trace.append(_STEP1)
+    trace.append(f"Observation: {obs1}")
+    trace.append(_STEP2)
     trace.append(f"Observation: {obs2}")
-
-    # Step 3
-    step3 = textwrap.dedent(f"""
-    Thought: I should retrieve a policy-approved executive hotel near Hitech City.
-    Action: corporate_hotel
-    Action Input: Hyderabad
-    """).strip()
-    trace.append(step3)
-    obs3 = corporate_hotel("Hyderabad")
+    trace.append(_STEP3)
     trace.append(f"Observation: {obs3}")
 
-    final_answer = textwrap.dedent(f"""
-    Final Answer: Hyderabad is a major Indian tech/business hub centered around Hitech City.
-    Recommended stay: {obs3}
-    Weather right now: {obs2}
-    Guidance: Stay within ~10 min of Hitech City to cut transit risk. Pack for actual conditions.
-    Mention the approved property in your expense note to avoid reimbursement issues.
-    """).strip()
+    final_answer = _FINAL_ANSWER_TMPL.format(hotel=obs3, weather=obs2)
     trace.append(final_answer)
 
     return "\n\n".join(trace)
 
 if __name__ == "__main__":
     import sys
+    if "--no-cache" in sys.argv:
+        sys.argv.remove("--no-cache")
+        clear_cache()
+
     if len(sys.argv) < 2:
         user_q = "Find me an exec-suitable hotel near Hitech City in Hyderabad for Monday. Include cost logic and packing/weather tips."
     else:
         user_q = " ".join(sys.argv[1:])
 
-    print("USER QUERY:", user_q)
-    print("=== REACT TRACE ===")
-    print(react_demo(user_q))
+    with contextlib.closing(_SESSION):
+        print("USER QUERY:", user_q)
+        print("=== REACT TRACE ===")
+        print(react_demo(user_q))
@@ -1,30 +1,153 @@
-import os, requests, sys, textwrap
-from openai import OpenAI
+import os, json, time, shutil, tempfile, hashlib, operator, requests, sys, textwrap, contextlib
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import importlib.util
 
 # Setup
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Please set OPENAI_API_KEY in environment.")
+MODEL = "o4-mini"
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+def _legacy_output_text(resp) -> str:
+    try:
+        return resp.choices[0].message.content
+    except Exception:
+        # fallback (Responses API structure)
+        if hasattr(resp, "output"):
+            if isinstance(resp.output, list):
+                return "\n".join(str(x) for x in resp.output)
+            return str(resp.output)
+        return str(resp)
+
+# The SDK (and httpx/pydantic behind it) is imported on first use rather than at
+# import, so usage and error paths start fast. get_client() also binds
+# _output_text: current SDKs always expose Response.output_text, and the older
+# shapes are only handled for SDKs that predate it.
+_client = None
+_output_text = _legacy_output_text
+
+def get_client():
+    global _client, _output_text
+    if _client is None:
+        if not OPENAI_API_KEY:
+            raise RuntimeError("Please set OPENAI_API_KEY in environment.")
+        import httpx
+        from openai import OpenAI, DefaultHttpxClient
+        try:
+            from openai.types.responses import Response
+            if hasattr(Response, "output_text"):
+                _output_text = operator.attrgetter("output_text")
+        except ImportError:
+            pass
+        # Keep-alive pool for the three back-to-back stage calls; HTTP/2 when `h2` is installed.
+        _client = OpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=DefaultHttpxClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=85),
+            ),
+        )
+    return _client
+
+# orjson (optional) parses the tool API payloads straight from the response bytes,
+# several times faster than r.json(); the stdlib json accepts the same bytes.
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 WIKI_HEADERS = {"User-Agent": "reflection-agent-demo/1.0"}
 
+# Shared keep-alive session: evidence lookups reuse pooled TCP+TLS connections.
+_SESSION = requests.Session()
+# Transient 429/5xx responses are retried here with exponential backoff (honouring
+# Retry-After), so the agent never spends a reasoning turn on a flaky endpoint.
+# raise_on_status=False hands the last response back, keeping the tools' error strings.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET"]),
+    raise_on_status=False,
+)
+_SESSION.mount("https://", HTTPAdapter(max_retries=_RETRY, pool_connections=8, pool_maxsize=16))
+_SESSION.headers.update(WIKI_HEADERS)
+
+CACHE_DIR = Path(__file__).parent / ".cache"
+WIKI_CACHE_TTL = 60 * 60       # summaries change rarely
+LLM_CACHE_TTL = 24 * 60 * 60   # identical prompts get identical answers during a dev loop
+
+_CACHE: Dict[Tuple[str, str], Tuple[float, str]] = {}
+
+def _cache_path(namespace: str, key: str) -> Path:
+    return CACHE_DIR / namespace / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+def cache_get(namespace: str, key: str, ttl: float) -> Optional[str]:
+    """
+    Return a cached tool result younger than `ttl` seconds, or None.
+    Looks in process memory first, then in the on-disk cache so repeat CLI runs also hit.
+    """
+    entry = _CACHE.get((namespace, key))
+    if entry is None:
+        try:
+            stored_at, value = json.loads(_cache_path(namespace, key).read_text(encoding="utf-8"))
+            entry = (float(stored_at), value)
+        except (OSError, ValueError, TypeError):
+            return None  # missing, torn or foreign file: treat as a miss
+        if not isinstance(value, str):
+            return None
+        _CACHE[(namespace, key)] = entry
+    stored_at, value = entry
+    if time.time() - stored_at > ttl:
+        return None
+    return value
+
+def cache_set(namespace: str, key: str, value: str) -> None:
+    entry = (time.time(), value)
+    _CACHE[(namespace, key)] = entry
+    path = _cache_path(namespace, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write a private temp file and rename it over the entry, so a concurrent
+    # writer or reader never sees a half-written file.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(entry))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def clear_cache() -> None:
+    _CACHE.clear()
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
 def wikipedia_summary(topic: str) -> str:
     """
     Fetch factual context about a topic from Wikipedia's REST API summary endpoint.
     This gives us grounding info that can be used by the critique stage to detect hallucinations.
     Wikipedia's REST /page/summary/{title} is a common lightweight way to retrieve an entity summary. [citation: Wikipedia REST API docs] 
+    Successful lookups are cached per normalized topic for WIKI_CACHE_TTL seconds.
     """
+    topic = topic.strip()
+    key = topic.lower()
+    cached = cache_get("wiki", key, WIKI_CACHE_TTL)
+    if cached is not None:
+        return cached
     url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic}"
-    r = requests.get(url, headers=WIKI_HEADERS, timeout=10)
+    r = _SESSION.get(url, timeout=10)
     if r.status_code != 200:
         return f"[wiki] error {r.status_code}: {r.text[:200]}"
-    d = r.json()
+    d = _loads(r.content)
     title = d.get("title","")
     desc = d.get("description","")
     summary = d.get("extract","")
-    return f"{title} — {desc}\n{summary}"
+    text = f"{title} — {desc}\n{summary}"
+    cache_set("wiki", key, text)
+    return text
 
 SYSTEM_DRAFT = """
 You are an expert analyst.
@@ -68,81 +191,165 @@ Do not include 'critique says...' meta-talk.
 Return only the final, improved answer.
 """
 
+SYSTEM_COMBINED = """
+You are an expert analyst who reviews your own work before shipping it.
+In ONE response, do all three stages:
+
+1. draft: the best possible answer to the user's question. Structured, factual, helpful.
+2. critique: a ruthless senior review of that draft. Point out factual claims that may be
+   wrong or unsupported (use the EVIDENCE provided to fact-check), missing executive context,
+   overpromising / unsafe advice / legal-style risk, and rambling or unclear structure.
+   Give concrete instructions on how to fix them.
+3. final: the draft rewritten using the critique, for a VP-level audience.
+   Keep strong points, fix gaps, be confident but never overpromise, no 'critique says...' meta-talk.
+
+Return ONLY a JSON object, no markdown fences:
+{"draft": "...", "critique": "...", "final": "..."}
+"""
+
+LLM_CACHE_STATS = {"hits": 0, "misses": 0}
+
 def call_oai(system_prompt: str, user_content: str):
     """
     Helper to call the model with a system instruction + user content.
     We use a reasoning-optimized model like `o4-mini`, which OpenAI positions
     for multi-step reasoning, self-critique, and tool integration. [citation: OpenAI model docs] 
+    Byte-identical (model, system, user) inputs are served from the local cache.
+    The SYSTEM_* prompts are passed verbatim, never formatted, so the provider's
+    prompt-prefix cache can hit; question, draft and evidence go in the user turn.
     """
-    resp = client.responses.create(
-        model="o4-mini",
+    key = hashlib.sha256(json.dumps(
+        {"model": MODEL, "sys": system_prompt, "user": user_content}, sort_keys=True
+    ).encode("utf-8")).hexdigest()
+    cached = cache_get("llm", key, LLM_CACHE_TTL)
+    if cached is not None:
+        LLM_CACHE_STATS["hits"] += 1
+        return cached
+    LLM_CACHE_STATS["misses"] += 1
+    text = _call_oai_uncached(system_prompt, user_content)
+    cache_set("llm", key, text)
+    return text
+
+def _call_oai_uncached(system_prompt: str, user_content: str):
+    resp = get_client().responses.create(
+        model=MODEL,
         input=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_content},
         ],
     )
-    # normalize
-    if hasattr(resp, "output_text"):
-        return resp.output_text
+    return _output_text(resp)
+
+def collect_evidence(evidence_topics=None) -> str:
+    """
+    Fetch Wikipedia evidence for every topic concurrently and format it as one EVIDENCE block.
+    """
+    if not evidence_topics:
+        return "(no external evidence provided)"
+    with ThreadPoolExecutor(max_workers=len(evidence_topics)) as ex:
+        summaries = list(ex.map(wikipedia_summary, evidence_topics))
+    return "\n\n".join(
+        f"[EVIDENCE for {topic}]\n{ev}" for topic, ev in zip(evidence_topics, summaries)
+    )
+
+def parse_combined(text: str):
+    """
+    Parse the SYSTEM_COMBINED reply into {"draft", "critique", "final"}.
+    Returns None when the model did not return a usable JSON object.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return None
     try:
-        return resp.choices[0].message.content
-    except Exception:
-        # fallback (Responses API structure)
-        if hasattr(resp, "output"):
-            if isinstance(resp.output, list):
-                return "\n".join(str(x) for x in resp.output)
-            return str(resp.output)
-        return str(resp)
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    if not all(isinstance(data.get(k), str) and data[k].strip() for k in ("draft", "critique", "final")):
+        return None
+    return data
+
+# Stage inputs, dedented once at import. Filling them with str.format also keeps
+# multi-line drafts/evidence from throwing off the dedent.
+_COMBINED_TMPL = textwrap.dedent("""
+USER QUESTION:
+{q}
+
+EVIDENCE:
+{e}
+
+Now return the draft, critique and final answer as JSON.
+""").strip()
+
+_CRITIQUE_TMPL = textwrap.dedent("""
+USER QUESTION:
+{q}
+
+DRAFT ANSWER:
+{d}
+
+EVIDENCE:
+{e}
+
+Now critique the DRAFT ANSWER.
+""").strip()
 
-def reflection_pipeline(user_question: str, evidence_topics=None):
+_REVISE_TMPL = textwrap.dedent("""
+USER QUESTION:
+{q}
+
+ORIGINAL DRAFT:
+{d}
+
+CRITIQUE:
+{c}
+
+Now produce the improved FINAL ANSWER.
+""").strip()
+
+def reflection_pipeline(user_question: str, evidence_topics=None, single_pass: bool = False):
     """
     Run full reflection loop:
     1. DRAFT
     2. CRITIQUE (with optional factual evidence)
     3. REVISED final answer
+
+    With single_pass=True all three stages come back from one SYSTEM_COMBINED call,
+    saving two model round-trips. If that reply is malformed we fall back to the chain.
     """
+    # Evidence lookups do not depend on the draft, so start them right away on a
+    # background thread; they overlap with the draft call below.
+    pool = ThreadPoolExecutor(max_workers=1)
+    evidence_future = pool.submit(collect_evidence, evidence_topics)
+    pool.shutdown(wait=False)
+
+    if single_pass:
+        evidence_text = evidence_future.result()
+        combined_input = _COMBINED_TMPL.format(q=user_question, e=evidence_text)
+        combined = parse_combined(call_oai(SYSTEM_COMBINED, combined_input))
+        if combined is not None:
+            return {
+                "draft": combined["draft"].strip(),
+                "critique": combined["critique"].strip(),
+                "final": combined["final"].strip(),
+                "evidence_used": evidence_text,
+            }
+
     # 1. Draft
     draft = call_oai(
         SYSTEM_DRAFT,
         f"USER QUESTION:\n{user_question}\n\nWrite the draft answer now."
     )
 
-    # 2. Collect evidence (optional grounding)
-    evidence_blocks = []
-    if evidence_topics:
-        for topic in evidence_topics:
-            ev = wikipedia_summary(topic)
-            evidence_blocks.append(f"[EVIDENCE for {topic}]\n{ev}")
-    evidence_text = "\n\n".join(evidence_blocks) if evidence_blocks else "(no external evidence provided)"
-
-    critique_input = textwrap.dedent(f"""
-    USER QUESTION:
-    {user_question}
-
-    DRAFT ANSWER:
-    {draft}
-
-    EVIDENCE:
-    {evidence_text}
-
-    Now critique the DRAFT ANSWER.
-    """).strip()
+    # 2. Critique, grounded by the evidence fetched in the background
+    evidence_text = evidence_future.result()
+    critique_input = _CRITIQUE_TMPL.format(q=user_question, d=draft, e=evidence_text)
 
     critique = call_oai(SYSTEM_CRITIQUE, critique_input)
 
     # 3. Revise
-    revise_input = textwrap.dedent(f"""
-    USER QUESTION:
-    {user_question}
-
-    ORIGINAL DRAFT:
-    {draft}
-
-    CRITIQUE:
-    {critique}
-
-    Now produce the improved FINAL ANSWER.
-    """).strip()
+    revise_input = _REVISE_TMPL.format(q=user_question, d=draft, c=critique)
 
     final_answer = call_oai(SYSTEM_REVISE, revise_input)
 
@@ -154,9 +361,19 @@ def reflection_pipeline(user_question: str, evidence_topics=None):
     }
 
 def main():
+    if "--no-cache" in sys.argv:
+        sys.argv.remove("--no-cache")
+        clear_cache()
+
+    single_pass = "--single-pass" in sys.argv
+    if single_pass:
+        sys.argv.remove("--single-pass")
+
     if len(sys.argv) < 2:
         print("Usage: python run_reflection_agent.py \"your question here\"")
         print("Optional: add topics for evidence after --topics, comma-separated.")
+        print("Optional: pass --no-cache to drop cached Wikipedia evidence and model answers first.")
+        print("Optional: pass --single-pass to get draft, critique and final from one model call.")
         print("Example:")
         print("python run_reflection_agent.py \"Why is Hyderabad important for tech?\" --topics Hyderabad")
         sys.exit(1)
@@ -171,7 +388,7 @@ def main():
         question = " ".join(sys.argv[1:])
         topics = []
 
-    result = reflection_pipeline(question, evidence_topics=topics)
+    result = reflection_pipeline(question, evidence_topics=topics, single_pass=single_pass)
 
     print("========== DRAFT ANSWER ==========")
     print(result["draft"])
@@ -181,6 +398,8 @@ def main():
     print(result["final"])
     print("\n========== EVIDENCE USED ==========")
     print(result["evidence_used"])
+    print(f"\n(LLM cache: {LLM_CACHE_STATS['hits']} hits, {LLM_CACHE_STATS['misses']} misses)")
 
 if __name__ == "__main__":
-    main()
+    with contextlib.closing(_SESSION):
+        main()
@@ -1,36 +1,167 @@
-import os, sys, re, json, requests, textwrap
-from typing import Dict, Callable, List
-from openai import OpenAI
+import os, sys, re, json, time, shutil, tempfile, hashlib, operator, requests, threading, contextlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Callable, Iterator, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import importlib.util
 
 # ---------- Environment / Setup ----------
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Please set OPENAI_API_KEY in environment.")
-
 OPENWEATHER_API_KEY = os.environ.get("OPENWEATHER_API_KEY", "<PUT_YOUR_KEY_HERE>")
-client = OpenAI(api_key=OPENAI_API_KEY)
+MODEL = "o4-mini"
+
+def _legacy_output_text(resp) -> str:
+    try:
+        return resp.choices[0].message.content
+    except Exception:
+        # fallback (Responses API structure)
+        if hasattr(resp, "output"):
+            if isinstance(resp.output, list):
+                return "\n".join(str(x) for x in resp.output)
+            return str(resp.output)
+        return str(resp)
+
+# The SDK (and httpx/pydantic behind it) is imported on first use rather than at
+# import, so usage and error paths start fast. get_client() also binds
+# _output_text: current SDKs always expose Response.output_text, and the older
+# shapes are only handled for SDKs that predate it.
+_client = None
+_output_text = _legacy_output_text
+_CLIENT_LOCK = threading.Lock()  # plan steps call the model from pool threads
+
+def get_client():
+    global _client, _output_text
+    with _CLIENT_LOCK:
+        if _client is None:
+            if not OPENAI_API_KEY:
+                raise RuntimeError("Please set OPENAI_API_KEY in environment.")
+            import httpx
+            from openai import OpenAI, DefaultHttpxClient
+            try:
+                from openai.types.responses import Response
+                if hasattr(Response, "output_text"):
+                    _output_text = operator.attrgetter("output_text")
+            except ImportError:
+                pass
+            # One client for all threads: the keep-alive pool is sized for concurrent plan steps,
+            # and HTTP/2 (if the optional `h2` package is installed) multiplexes them on one socket.
+            _client = OpenAI(
+                api_key=OPENAI_API_KEY,
+                http_client=DefaultHttpxClient(
+                    http2=importlib.util.find_spec("h2") is not None,
+                    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=85),
+                ),
+            )
+        return _client
+
+# orjson (optional) parses the tool API payloads straight from the response bytes,
+# several times faster than r.json(); the stdlib json accepts the same bytes.
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
 WIKI_HEADERS = {"User-Agent": "planner-executor-critic-demo/1.0"}
 
+# Shared keep-alive session: every tool call across all plan steps reuses
+# pooled TCP+TLS connections instead of opening a fresh one per request.
+_SESSION = requests.Session()
+# Transient 429/5xx responses are retried here with exponential backoff (honouring
+# Retry-After), so the agent never spends a reasoning turn on a flaky endpoint.
+# raise_on_status=False hands the last response back, keeping the tools' error strings.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(["GET"]),
+    raise_on_status=False,
+)
+_SESSION.mount("https://", HTTPAdapter(max_retries=_RETRY, pool_connections=8, pool_maxsize=16))
+_SESSION.headers.update(WIKI_HEADERS)
+
+# ---------- Tool result cache ----------
+
+CACHE_DIR = Path(__file__).parent / ".cache"
+WIKI_CACHE_TTL = 60 * 60       # summaries change rarely
+WEATHER_CACHE_TTL = 5 * 60     # weather is only good for a few minutes
+LLM_CACHE_TTL = 24 * 60 * 60   # identical prompts get identical answers during a dev loop
+
+_CACHE: Dict[Tuple[str, str], Tuple[float, str]] = {}
+
+def _cache_path(namespace: str, key: str) -> Path:
+    return CACHE_DIR / namespace / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+def cache_get(namespace: str, key: str, ttl: float) -> Optional[str]:
+    """
+    Return a cached tool result younger than `ttl` seconds, or None.
+    Looks in process memory first, then in the on-disk cache so repeat CLI runs also hit.
+    """
+    entry = _CACHE.get((namespace, key))
+    if entry is None:
+        try:
+            stored_at, value = json.loads(_cache_path(namespace, key).read_text(encoding="utf-8"))
+            entry = (float(stored_at), value)
+        except (OSError, ValueError, TypeError):
+            return None  # missing, torn or foreign file: treat as a miss
+        if not isinstance(value, str):
+            return None
+        _CACHE[(namespace, key)] = entry
+    stored_at, value = entry
+    if time.time() - stored_at > ttl:
+        return None
+    return value
+
+def cache_set(namespace: str, key: str, value: str) -> None:
+    entry = (time.time(), value)
+    _CACHE[(namespace, key)] = entry
+    path = _cache_path(namespace, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write a private temp file and rename it over the entry, so a concurrent
+    # writer or reader never sees a half-written file.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(entry))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def clear_cache() -> None:
+    _CACHE.clear()
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
 # ---------- Tools ----------
 
 def wikipedia_summary(topic: str) -> str:
     """
     Wikipedia REST /page/summary/{title} gives a concise factual summary
     for entities like cities and companies, commonly used for programmatic context.
+    Successful lookups are cached per normalized topic for WIKI_CACHE_TTL seconds.
     """
+    topic = topic.strip()
+    key = topic.lower()
+    cached = cache_get("wiki", key, WIKI_CACHE_TTL)
+    if cached is not None:
+        return cached
     url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic}"
-    r = requests.get(url, headers=WIKI_HEADERS, timeout=10)
+    r = _SESSION.get(url, timeout=10)
     if r.status_code != 200:
         return f"[wiki] error {r.status_code}: {r.text[:200]}"
-    d = r.json()
-    return f"{d.get('title','')} — {d.get('description','')}\n{d.get('extract','')}"
+    d = _loads(r.content)
+    summary = f"{d.get('title','')} — {d.get('description','')}\n{d.get('extract','')}"
+    cache_set("wiki", key, summary)
+    return summary
 
 def weather_brief(latlon: str) -> str:
     """
     OpenWeather 'current weather' endpoint returns live conditions for given lat/lon
     (temp, description). Requires API key, free tier available.
+    Successful lookups are cached per coordinate pair for WEATHER_CACHE_TTL seconds.
     """
     if OPENWEATHER_API_KEY.startswith("<PUT_"):
         return "[weather] Please set OPENWEATHER_API_KEY."
@@ -38,23 +169,34 @@ def weather_brief(latlon: str) -> str:
         lat, lon = [float(x.strip()) for x in latlon.split(",")]
     except Exception as e:
         return f"[weather] bad lat/lon input: {latlon} ({e})"
+    key = f"{lat},{lon}"
+    cached = cache_get("weather", key, WEATHER_CACHE_TTL)
+    if cached is not None:
+        return cached
     url = "https://api.openweathermap.org/data/2.5/weather"
     params = {"lat": lat, "lon": lon, "appid": OPENWEATHER_API_KEY}
-    r = requests.get(url, params=params, timeout=10)
+    r = _SESSION.get(url, params=params, timeout=10)
     if r.status_code != 200:
         return f"[weather] error {r.status_code}: {r.text[:200]}"
-    d = r.json()
+    d = _loads(r.content)
     def k2c(k): return round(k - 273.15, 1)
     desc = d["weather"][0]["description"]
     temp_c = k2c(d["main"]["temp"])
-    return f"{desc}, {temp_c}°C"
+    brief = f"{desc}, {temp_c}°C"
+    cache_set("weather", key, brief)
+    return brief
 
 def corporate_hotel(city: str) -> str:
     """
     Internal policy hook. In real life, this would talk to travel policy DB.
     Here we hardcode Hyderabad as corporate-approved.
     """
-    if city.lower() == "hyderabad":
+    return _corporate_hotel(city.strip().lower())
+
+@lru_cache(maxsize=256)
+def _corporate_hotel(city: str) -> str:
+    # keyed on the normalized city, so "Hyderabad" and " hyderabad" share one entry
+    if city == "hyderabad":
         return (
             "MetroLink Executive Suites (~₹5400/night). "
             "Walkable to Hitech City offices. Breakfast+gym included. "
@@ -70,30 +212,105 @@ TOOLS: Dict[str, Callable[[str], str]] = {
 
 # ---------- Helper: call OpenAI ----------
 
+LLM_CACHE_STATS = {"hits": 0, "misses": 0}
+_STATS_LOCK = threading.Lock()  # bumped from the pool threads and the plan stream
+
+def _count_llm_cache(outcome: str) -> None:
+    with _STATS_LOCK:
+        LLM_CACHE_STATS[outcome] += 1
+
 def call_model(system_prompt: str, user_prompt: str) -> str:
     """
     Unified call helper for OpenAI reasoning model (o4-mini).
     o4-mini is optimized for stepwise reasoning, planning, and tool-use flows.
+    Byte-identical (model, system, user) inputs are served from the local cache,
+    so re-running the same goal skips the provider round-trip.
+
+    Keep system_prompt a module-level SYSTEM_* constant (no per-call formatting) so
+    providers that cache long identical prefixes can reuse it across calls.
+    """
+    return call_turns(system_prompt, [{"role": "user", "content": user_prompt}])
+
+def call_turns(system_prompt: str, turns: List[dict], stop_re: Optional[re.Pattern] = None) -> str:
+    """
+    Multi-turn form of call_model: `turns` are the user/assistant messages that follow
+    the system prompt. With `stop_re`, the reply is streamed and the stream is closed as
+    soon as the partial text matches, so we stop paying for tokens we would throw away.
     """
-    resp = client.responses.create(
-        model="o4-mini",
-        input=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+    key = _llm_cache_key(system_prompt, turns)
+    cached = cache_get("llm", key, LLM_CACHE_TTL)
+    if cached is not None:
+        _count_llm_cache("hits")
+        return cached
+    _count_llm_cache("misses")
+    if stop_re is None:
+        text = _call_model_uncached(system_prompt, turns)
+    else:
+        text = _stream_until(system_prompt, turns, stop_re)
+    cache_set("llm", key, text)
+    return text
+
+def _llm_cache_key(system_prompt: str, turns: List[dict]) -> str:
+    return hashlib.sha256(json.dumps(
+        {"model": MODEL, "sys": system_prompt, "turns": turns}, sort_keys=True
+    ).encode("utf-8")).hexdigest()
+
+def _call_model_uncached(system_prompt: str, turns: List[dict]) -> str:
+    resp = get_client().responses.create(
+        model=MODEL,
+        input=[{"role": "system", "content": system_prompt}, *turns],
     )
-    # Try Responses API .output_text first
-    if hasattr(resp, "output_text"):
-        return resp.output_text
-    # Fallbacks
+    return _output_text(resp)
+
+def _stream_until(system_prompt: str, turns: List[dict], stop_re: re.Pattern) -> str:
+    buf = ""
+    with get_client().responses.stream(
+        model=MODEL,
+        input=[{"role": "system", "content": system_prompt}, *turns],
+    ) as stream:
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                buf += event.delta
+                m = stop_re.search(buf)
+                if m:
+                    # leaving the `with` block closes the connection mid-generation
+                    return buf[:m.end()]
+    return buf
+
+# ---------- Helper: context budget ----------
+
+CONTEXT_BUDGET = 120_000   # prompt tokens; leaves headroom in the model window for the reply
+
+# tiktoken (optional) gives exact counts; without it, or when its encoding files
+# cannot be fetched, fall back to the usual ~4 characters per token estimate.
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
     try:
-        return resp.choices[0].message.content
+        return tiktoken.encoding_for_model(MODEL)
     except Exception:
-        if hasattr(resp, "output"):
-            if isinstance(resp.output, list):
-                return "\n".join(str(x) for x in resp.output)
-            return str(resp.output)
-        return str(resp)
+        return None
+
+def count_tokens(text: str) -> int:
+    enc = _encoding()
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text))
+
+@lru_cache(maxsize=32)
+def system_prompt_tokens(system_prompt: str) -> int:
+    """Token count of a SYSTEM_* constant; each prompt is only tokenized once per process."""
+    return count_tokens(system_prompt)
+
+def fits_context(system_prompt: str, turns: List[dict], budget: int = CONTEXT_BUDGET) -> bool:
+    used = system_prompt_tokens(system_prompt) + sum(count_tokens(t["content"]) for t in turns)
+    return used < budget
 
 # ---------- 1. PLANNER ----------
 
@@ -113,24 +330,117 @@ PLAN:
 Do not add anything else.
 """
 
+PLAN_STEP_RE = re.compile(r"^\d+\.\s*(.+)$")
+
 def make_plan(goal: str) -> List[str]:
-    plan_text = call_model(
-        SYSTEM_PLANNER,
-        f"GOAL:\n{goal}\n\nCreate the PLAN now."
-    )
+    return list(iter_plan(goal))
+
+def iter_plan(goal: str) -> Iterator[str]:
+    """
+    Yield plan steps one at a time, as soon as each numbered line has been streamed,
+    so the caller can start executing step 1 while the planner is still writing step 2.
+    """
     # Extract numbered steps after "PLAN:"
-    steps = []
     in_plan = False
-    for line in plan_text.splitlines():
+    for line in _iter_plan_lines(goal):
         line = line.strip()
         if line.upper().startswith("PLAN"):
             in_plan = True
             continue
         if in_plan:
-            m = re.match(r"^\d+\.\s*(.+)$", line)
+            m = PLAN_STEP_RE.match(line)
             if m:
-                steps.append(m.group(1).strip())
-    return steps
+                yield m.group(1).strip()
+
+def _iter_plan_lines(goal: str) -> Iterator[str]:
+    # Same cache entry as call_model(SYSTEM_PLANNER, ...); the full text is only
+    # stored once the stream has finished.
+    turns = [{"role": "user", "content": f"GOAL:\n{goal}\n\nCreate the PLAN now."}]
+    key = _llm_cache_key(SYSTEM_PLANNER, turns)
+    cached = cache_get("llm", key, LLM_CACHE_TTL)
+    if cached is not None:
+        _count_llm_cache("hits")
+        yield from cached.splitlines()
+        return
+    _count_llm_cache("misses")
+
+    parts = []
+    buf = ""
+    with get_client().responses.stream(
+        model=MODEL,
+        input=[{"role": "system", "content": SYSTEM_PLANNER}, *turns],
+    ) as stream:
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                parts.append(event.delta)
+                buf += event.delta
+                while "\n" in buf:
+                    line, buf = buf.split("\n", 1)
+                    yield line
+    if buf:
+        yield buf
+    cache_set("llm", key, "".join(parts))
+
+SYSTEM_PLANNER_FUSED = """
+You are a planning agent that also starts the work.
+Break the high-level GOAL into a short numbered plan (3-6 steps).
+Each step must be concrete, observable, and something we can attempt with tools.
+Then begin executing step 1 only.
+
+TOOLS step 1 MAY REQUEST:
+1. wikipedia_summary(topic: str)
+2. weather_brief(lat,lon as string \"LAT,LON\")
+3. corporate_hotel(city: str)
+
+Your output format MUST be:
+
+PLAN:
+1. ...
+2. ...
+3. ...
+
+STEP 1 EXECUTION:
+Thought: ...
+then EITHER
+Action: <tool_name>
+Action Input: <argument>
+OR, if step 1 needs no tool,
+Final Answer: <concise result for step 1>
+
+Do not add anything else. Never write an Observation yourself.
+"""
+
+FUSED_RE = re.compile(r"PLAN:\s*(?P<plan>.*?)STEP 1 EXECUTION:\s*(?P<exec>.*)", re.I | re.S)
+
+def plan_and_start(goal: str, coords_for_weather: str = None) -> Optional[Tuple[List[str], str]]:
+    """
+    One model call that returns the plan plus the executor's first reply for step 1,
+    saving the round-trip execute_step would otherwise spend on it.
+    Returns (steps, step1_reply), or None if the reply is malformed.
+    """
+    coords_hint = f"Coordinates for weather: {coords_for_weather}\n\n" if coords_for_weather else ""
+    text = call_model(
+        SYSTEM_PLANNER_FUSED,
+        f"GOAL:\n{goal}\n\n{coords_hint}Create the PLAN and start step 1 now."
+    )
+    m = FUSED_RE.search(text)
+    if not m:
+        return None
+    steps = []
+    for line in m.group("plan").splitlines():
+        m_step = PLAN_STEP_RE.match(line.strip())
+        if m_step:
+            steps.append(m_step.group(1).strip())
+    first = m.group("exec").strip()
+    m_act = ACTION_DONE_RE.search(first + "\n")
+    m_final = FINAL_RE.search(first)
+    if m_act and (m_final is None or m_act.start() < m_final.start()):
+        first = first[:m_act.end()].rstrip()   # drop anything invented after the action
+    elif m_final is None:
+        return None
+    if not steps:
+        return None
+    return steps, first
 
 # ---------- 2. EXECUTOR (per step) ----------
 
@@ -187,34 +497,92 @@ def interpret_executor_output(text: str):
     # fallback
     return {"type":"final","answer":text.strip(),"raw":text}
 
-def execute_step(step_desc: str) -> dict:
+MAX_EXECUTOR_TURNS = 3
+
+# A complete "Action: ... / Action Input: ..." line pair. Whatever the model writes after
+# it (typically an invented Observation) is discarded anyway, so streaming stops there.
+ACTION_DONE_RE = re.compile(
+    r"Action:\s*\w+\s*[\r\n]+Action Input:[^\r\n]*\S[^\r\n]*[\r\n]",
+    re.I
+)
+
+_MEMO_LOCK = threading.Lock()  # guards every run_memo; held only to look up or claim a key
+
+def _memo_call(
+    run_memo: Dict[Tuple[str, str], "Future[str]"],
+    memo_key: Tuple[str, str],
+    tool_fn: Callable[[str], str],
+    tool_input: str,
+) -> Tuple[str, bool]:
+    """
+    Return (observation, reused). The first step to ask for `memo_key` claims it and
+    runs the tool; steps asking at the same time wait on that call's Future instead
+    of making their own.
+    """
+    with _MEMO_LOCK:
+        fut = run_memo.get(memo_key)
+        owner = fut is None
+        if owner:
+            fut = run_memo[memo_key] = Future()
+    if owner:
+        try:
+            fut.set_result(tool_fn(tool_input))
+        except BaseException as e:
+            fut.set_exception(e)
+    return fut.result(), not owner
+
+def execute_step(
+    step_desc: str,
+    run_memo: Optional[Dict[Tuple[str, str], "Future[str]"]] = None,
+    first_reply: Optional[str] = None,
+) -> dict:
     """
     Run a ReAct-like loop for ONE step in the plan.
     The agent can call tools multiple times until it returns Final Answer for that step.
+
+    The exchange is sent as separate turns (step, reply, observation, ...) instead of one
+    re-built trace string, so every call extends the previous call's prompt prefix.
+
+    `run_memo` is shared by every step of one pipeline run: an identical (tool, input)
+    request runs the tool once, even when steps ask concurrently (see _memo_call).
+
+    `first_reply`, when given, stands in for the first model reply (see plan_and_start).
     """
+    if run_memo is None:
+        run_memo = {}
     trace = ""
     step_result = None
+    turns = [{"role": "user", "content": f"STEP DESCRIPTION:\n{step_desc}\n\nFollow the protocol."}]
 
-    for _ in range(5):
-        llm_out = call_model(
-            SYSTEM_EXECUTOR,
-            f"STEP DESCRIPTION:\n{step_desc}\n\nTRACE SO FAR:\n{trace}\n\nFollow the protocol."
-        )
+    for _ in range(MAX_EXECUTOR_TURNS):
+        if not fits_context(SYSTEM_EXECUTOR, turns):
+            trace += "[executor] stopped: next prompt would exceed the context budget\n"
+            break
+        if first_reply is not None:
+            llm_out, first_reply = first_reply, None
+        else:
+            llm_out = call_turns(SYSTEM_EXECUTOR, turns, stop_re=ACTION_DONE_RE)
         decision = interpret_executor_output(llm_out)
-        trace += llm_out + "\n"
+        trace += llm_out.rstrip() + "\n"
 
         if decision["type"] == "final":
             step_result = decision["answer"]
             break
 
-        # run tool
+        # run tool (or reuse an identical call made earlier in this run)
         tool_fn = TOOLS.get(decision["tool"])
+        memo_key = (decision["tool"], decision["input"].strip().lower())
         if tool_fn is None:
             obs = f"[ERROR] Unknown tool '{decision['tool']}'"
+            trace += f"Observation: {obs}\n"
         else:
-            obs = tool_fn(decision["input"])
+            obs, reused = _memo_call(run_memo, memo_key, tool_fn, decision["input"])
+            trace += f"{'[cache] ' if reused else ''}Observation: {obs}\n"
 
-        trace += f"Observation: {obs}\n"
+        turns.append({"role": "assistant", "content": llm_out})
+        turns.append({"role": "user", "content": f"Observation: {obs}"})
+    else:
+        trace += f"[executor] stopped after {MAX_EXECUTOR_TURNS} turns without a Final Answer\n"
 
     return {
         "trace": trace,
@@ -280,33 +648,60 @@ def synthesize_final(goal: str, revised_steps: List[str]) -> str:
 
 # ---------- Orchestration main ----------
 
-def run_full_pipeline(goal: str, coords_for_weather: str = None):
+def execute_and_critique(
+    step_desc: str,
+    run_memo: Optional[Dict[Tuple[str, str], "Future[str]"]] = None,
+    first_reply: Optional[str] = None,
+):
+    """
+    Execute one step and critique it straight away. A critique only needs its own
+    step's result, so it runs while other steps are still executing.
+    """
+    step_exec = execute_step(step_desc, run_memo, first_reply)
+    crit = critique_step(step_desc, step_exec["result"] or "")
+    return step_exec, crit
+
+def run_full_pipeline(goal: str, coords_for_weather: str = None, max_workers: int = 4, fused: bool = False):
     """
     1. Plan steps
     2. Execute each step (with tool calls)
     3. Critique each step
     4. Synthesize final brief
-    """
-    plan_steps = make_plan(goal)
-    # If we got coords, try to auto-inject them into any weather step text
-    if coords_for_weather:
-        # crude heuristic: append coords hint to any step mentioning 'weather'
-        plan_steps = [
-            (s + f" Use coordinates {coords_for_weather} for weather.")
-            if "weather" in s.lower()
-            else s
-            for s in plan_steps
-        ]
 
+    execute_step only ever sees its own step description, so steps are
+    independent; each step's execute+critique chain runs concurrently on up
+    to `max_workers` threads.
+
+    With fused=True the plan and step 1's first executor reply come back from one
+    SYSTEM_PLANNER_FUSED call. If that reply is malformed we fall back to the
+    streamed planner.
+    """
+    plan_steps = []
     executed_info = []
     critiqued_info = []
 
-    for idx, step_desc in enumerate(plan_steps, start=1):
-        step_exec = execute_step(step_desc)
-        executed_info.append((step_desc, step_exec))
-
-        crit = critique_step(step_desc, step_exec["result"] or "")
-        critiqued_info.append(crit["revised"])
+    # Tool calls and LLM calls are blocking I/O, so a thread pool overlaps
+    # them. Steps are submitted as the planner streams them out, so step 1 is
+    # already executing while later steps are still being generated; results
+    # are collected in plan order. All steps share one memo so a repeated
+    # tool call within this run is only made once.
+    run_memo: Dict[Tuple[str, str], "Future[str]"] = {}
+    fused_plan = plan_and_start(goal, coords_for_weather) if fused else None
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = []
+        for i, s in enumerate(fused_plan[0] if fused_plan else iter_plan(goal)):
+            # If we got coords, try to auto-inject them into any weather step text
+            # (crude heuristic: append coords hint to any step mentioning 'weather')
+            if coords_for_weather and "weather" in s.lower():
+                s += f" Use coordinates {coords_for_weather} for weather."
+            plan_steps.append(s)
+            first_reply = fused_plan[1] if fused_plan and i == 0 else None
+            futures.append(pool.submit(execute_and_critique, s, run_memo, first_reply))
+
+        for step_desc, fut in zip(plan_steps, futures):
+            step_exec, crit = fut.result()
+            executed_info.append((step_desc, step_exec))
+            critiqued_info.append(crit["revised"])
 
     final_brief = synthesize_final(goal, [c for c in critiqued_info])
 
@@ -318,8 +713,16 @@ def run_full_pipeline(goal: str, coords_for_weather: str = None):
     }
 
 def main():
+    if "--no-cache" in sys.argv:
+        sys.argv.remove("--no-cache")
+        clear_cache()
+
+    fused = "--fused" in sys.argv
+    if fused:
+        sys.argv.remove("--fused")
+
     if len(sys.argv) < 2:
-        print("Usage: python run_planner_agent.py \"your high-level goal\" [--coords \"LAT,LON\"]")
+        print("Usage: python run_planner_agent.py \"your high-level goal\" [--coords \"LAT,LON\"] [--no-cache] [--fused]")
         sys.exit(1)
 
     if "--coords" in sys.argv:
@@ -330,7 +733,7 @@ def main():
         goal = " ".join(sys.argv[1:])
         coords = None
 
-    result = run_full_pipeline(goal, coords_for_weather=coords)
+    result = run_full_pipeline(goal, coords_for_weather=coords, fused=fused)
 
     print("========== PLAN ==========")
     for i, step_text in enumerate(result["plan_steps"], start=1):
@@ -349,6 +752,8 @@ def main():
 
     print("\n========== FINAL EXECUTIVE BRIEF ==========")
     print(result["final_brief"])
+    print(f"\n(LLM cache: {LLM_CACHE_STATS['hits']} hits, {LLM_CACHE_STATS['misses']} misses)")
 
 if __name__ == "__main__":
-    main()
+    with contextlib.closing(_SESSION):
+        main()
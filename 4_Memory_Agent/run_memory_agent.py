@@ -1,29 +1,208 @@
-import os, json, sys, textwrap
-from openai import OpenAI
+import os, re, json, sys, time, shutil, tempfile, sqlite3, hashlib, operator, textwrap
+import importlib.util
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 
-MEMORY_FILE = Path(__file__).parent / "memory.json"
+MEMORY_FILE = Path(__file__).parent / "memory.json"   # seed profile + human-readable export
+MEMORY_DB = Path(__file__).parent / "memory.db"
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Please set OPENAI_API_KEY in environment.")
+MODEL = "o4-mini"
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+def _legacy_output_text(resp) -> str:
+    try:
+        return resp.choices[0].message.content
+    except Exception:
+        # fallback (Responses API structure)
+        if hasattr(resp, "output"):
+            if isinstance(resp.output, list):
+                return "\n".join(str(x) for x in resp.output)
+            return str(resp.output)
+        return str(resp)
+
+# The SDK (and httpx/pydantic behind it) is imported on first use rather than at
+# import, so usage and error paths start fast. get_client() also binds
+# _output_text: current SDKs always expose Response.output_text, and the older
+# shapes are only handled for SDKs that predate it.
+_client = None
+_output_text = _legacy_output_text
+
+def get_client():
+    global _client, _output_text
+    if _client is None:
+        if not OPENAI_API_KEY:
+            raise RuntimeError("Please set OPENAI_API_KEY in environment.")
+        import httpx
+        from openai import OpenAI, DefaultHttpxClient
+        try:
+            from openai.types.responses import Response
+            if hasattr(Response, "output_text"):
+                _output_text = operator.attrgetter("output_text")
+        except ImportError:
+            pass
+        # Keep-alive pool so the scratchpad, answer and memory-gate calls share one connection;
+        # HTTP/2 when the optional `h2` package is installed.
+        _client = OpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=DefaultHttpxClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=85),
+            ),
+        )
+    return _client
+
+# orjson (optional) serializes and parses the memory several times faster than the
+# stdlib; both paths produce the same indented UTF-8 text and accept str or bytes.
+try:
+    import orjson
+
+    def _dump(obj, sort_keys: bool = False) -> str:
+        option = orjson.OPT_INDENT_2 | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, option=option).decode("utf-8")
+
+    _loads = orjson.loads
+except ImportError:
+    def _dump(obj, sort_keys: bool = False) -> str:
+        return json.dumps(obj, indent=2, sort_keys=sort_keys, ensure_ascii=False)
+
+    _loads = json.loads
 
 ########################################
 # Utility: load/save long-term memory
 ########################################
 
-def load_memory():
-    if MEMORY_FILE.exists():
-        with open(MEMORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {"user_profile": {}, "last_updated": None}
+# The live store is SQLite (memory.db): one row per profile key, so reading or
+# writing a preference is a B-tree lookup instead of re-parsing / rewriting a JSON
+# blob that grows with the profile. Values are stored JSON-encoded (some are lists).
+# memory.json seeds an empty database and is regenerated on demand with --dump.
+_conn = None
+
+def get_conn() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(MEMORY_DB)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("CREATE TABLE IF NOT EXISTS profile(k TEXT PRIMARY KEY, v TEXT)")
+        _conn.execute("CREATE TABLE IF NOT EXISTS meta(k TEXT PRIMARY KEY, v TEXT)")
+        if _conn.execute("SELECT 1 FROM profile LIMIT 1").fetchone() is None:
+            _seed_from_json(_conn)
+        _conn.commit()
+    return _conn
+
+def _seed_from_json(conn: sqlite3.Connection):
+    if not MEMORY_FILE.exists():
+        return
+    seed = _loads(MEMORY_FILE.read_bytes())
+    conn.executemany(
+        "INSERT OR REPLACE INTO profile VALUES(?,?)",
+        [(k, json.dumps(v, ensure_ascii=False)) for k, v in (seed.get("user_profile") or {}).items()],
+    )
+    conn.execute("INSERT OR REPLACE INTO meta VALUES('last_updated',?)", (seed.get("last_updated"),))
 
-def save_memory(mem):
+def load_memory():
+    conn = get_conn()
+    profile = {k: _loads(v) for k, v in conn.execute("SELECT k,v FROM profile")}
+    row = conn.execute("SELECT v FROM meta WHERE k='last_updated'").fetchone()
+    return {"user_profile": profile, "last_updated": row[0] if row else None}
+
+def store_memory_update(mem, key, value):
+    """Upsert one profile key in memory.db and mirror it into the loaded `mem` dict."""
+    conn = get_conn()
+    conn.execute("INSERT OR REPLACE INTO profile VALUES(?,?)", (key, json.dumps(value, ensure_ascii=False)))
+    conn.execute("INSERT OR REPLACE INTO meta VALUES('last_updated','updated')")
+    conn.commit()
+    if "user_profile" not in mem or not isinstance(mem["user_profile"], dict):
+        mem["user_profile"] = {}
+    mem["user_profile"][key] = value
     mem["last_updated"] = "updated"
-    with open(MEMORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(mem, f, indent=2)
+
+def dump_memory(path: Optional[Path] = None):
+    """Export memory.db as indented JSON for humans; the file is replaced atomically."""
+    path = path or MEMORY_FILE
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(_dump(load_memory()), encoding="utf-8")
+    os.replace(tmp, path)
+
+########################################
+# Utility: cached model calls
+########################################
+
+CACHE_DIR = Path(__file__).parent / ".cache"
+LLM_CACHE_TTL = 24 * 60 * 60   # identical prompts get identical answers during a dev loop
+
+_CACHE: Dict[Tuple[str, str], Tuple[float, str]] = {}
+LLM_CACHE_STATS = {"hits": 0, "misses": 0}
+
+def _cache_path(namespace: str, key: str) -> Path:
+    return CACHE_DIR / namespace / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
+
+def cache_get(namespace: str, key: str, ttl: float) -> Optional[str]:
+    """
+    Return a cached result younger than `ttl` seconds, or None.
+    Looks in process memory first, then in the on-disk cache so repeat CLI runs also hit.
+    """
+    entry = _CACHE.get((namespace, key))
+    if entry is None:
+        try:
+            stored_at, value = json.loads(_cache_path(namespace, key).read_text(encoding="utf-8"))
+            entry = (float(stored_at), value)
+        except (OSError, ValueError, TypeError):
+            return None  # missing, torn or foreign file: treat as a miss
+        if not isinstance(value, str):
+            return None
+        _CACHE[(namespace, key)] = entry
+    stored_at, value = entry
+    if time.time() - stored_at > ttl:
+        return None
+    return value
+
+def cache_set(namespace: str, key: str, value: str) -> None:
+    entry = (time.time(), value)
+    _CACHE[(namespace, key)] = entry
+    path = _cache_path(namespace, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write a private temp file and rename it over the entry, so a concurrent
+    # writer or reader never sees a half-written file.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps(entry))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+def clear_cache() -> None:
+    _CACHE.clear()
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+def call_model(system_prompt: str, user_prompt: str) -> str:
+    """
+    Call the reasoning model and return its stripped text output.
+    Byte-identical (model, system, user) inputs are served from the local cache.
+    SYSTEM_* prompts are constants sent unchanged every turn; anything that varies
+    per turn belongs in user_prompt so the stable prefix stays cacheable upstream.
+    """
+    key = hashlib.sha256(json.dumps(
+        {"model": MODEL, "sys": system_prompt, "user": user_prompt}, sort_keys=True
+    ).encode("utf-8")).hexdigest()
+    cached = cache_get("llm", key, LLM_CACHE_TTL)
+    if cached is not None:
+        LLM_CACHE_STATS["hits"] += 1
+        return cached
+    LLM_CACHE_STATS["misses"] += 1
+
+    resp = get_client().responses.create(
+        model=MODEL,
+        input=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+    )
+    text = _output_text(resp).strip()
+
+    cache_set("llm", key, text)
+    return text
 
 ########################################
 # 1. Build scratchpad summary
@@ -40,23 +219,7 @@ Return ONLY the summary text, no bullet labels.
 """
 
 def build_scratchpad(user_msg: str) -> str:
-    resp = client.responses.create(
-        model="o4-mini",
-        input=[
-            {"role": "system", "content": SYSTEM_SCRATCHPAD},
-            {"role": "user", "content": user_msg},
-        ],
-    )
-    if hasattr(resp, "output_text"):
-        return resp.output_text.strip()
-    try:
-        return resp.choices[0].message.content.strip()
-    except Exception:
-        if hasattr(resp, "output"):
-            if isinstance(resp.output, list):
-                return "\n".join(str(x) for x in resp.output).strip()
-            return str(resp.output)
-        return str(resp).strip()
+    return call_model(SYSTEM_SCRATCHPAD, user_msg)
 
 ########################################
 # 2. Answer using memory + scratchpad
@@ -79,36 +242,27 @@ Your job:
 Output only the final answer for the user.
 """
 
-def answer_with_memory(long_term_memory: dict, scratchpad: str, user_question: str) -> str:
-    composite_prompt = textwrap.dedent(f"""
-    LONG_TERM_MEMORY:
-    {json.dumps(long_term_memory, indent=2)}
+# Dedented once at import; the memory JSON has column-0 lines, so it has to be
+# substituted after the dedent rather than before.
+_ANSWER_TMPL = textwrap.dedent("""
+LONG_TERM_MEMORY:
+{memory}
 
-    SCRATCHPAD:
-    {scratchpad}
+SCRATCHPAD:
+{scratchpad}
 
-    USER_QUESTION:
-    {user_question}
-    """).strip()
+USER_QUESTION:
+{question}
+""").strip()
 
-    resp = client.responses.create(
-        model="o4-mini",
-        input=[
-            {"role": "system", "content": SYSTEM_ANSWER},
-            {"role": "user", "content": composite_prompt},
-        ],
+def answer_with_memory(long_term_memory: dict, scratchpad: str, user_question: str) -> str:
+    composite_prompt = _ANSWER_TMPL.format(
+        memory=_dump(long_term_memory, sort_keys=True),
+        scratchpad=scratchpad,
+        question=user_question,
     )
 
-    if hasattr(resp, "output_text"):
-        return resp.output_text.strip()
-    try:
-        return resp.choices[0].message.content.strip()
-    except Exception:
-        if hasattr(resp, "output"):
-            if isinstance(resp.output, list):
-                return "\n".join(str(x) for x in resp.output).strip()
-            return str(resp.output)
-        return str(resp).strip()
+    return call_model(SYSTEM_ANSWER, composite_prompt)
 
 ########################################
 # 3. Memory write proposal
@@ -143,51 +297,45 @@ Rules:
 - Focus on preferences and recurring context that will matter in future answers.
 """
 
-def propose_memory_update(long_term_memory: dict, user_msg: str, final_answer: str) -> str:
-    composite_prompt = textwrap.dedent(f"""
-    USER_MESSAGE:
-    {user_msg}
+_MEMORY_WRITE_TMPL = textwrap.dedent("""
+CURRENT_LONG_TERM_MEMORY:
+{memory}
 
-    ASSISTANT_FINAL_ANSWER:
-    {final_answer}
+USER_MESSAGE:
+{user_msg}
 
-    CURRENT_LONG_TERM_MEMORY:
-    {json.dumps(long_term_memory, indent=2)}
+ASSISTANT_FINAL_ANSWER:
+{final_answer}
 
-    Produce memory decision now.
-    """).strip()
+Produce memory decision now.
+""").strip()
 
-    resp = client.responses.create(
-        model="o4-mini",
-        input=[
-            {"role": "system", "content": SYSTEM_MEMORY_WRITE},
-            {"role": "user", "content": composite_prompt},
-        ],
+def propose_memory_update(long_term_memory: dict, user_msg: str, final_answer: str) -> str:
+    # Memory goes first: it is the part that repeats turn after turn, so the
+    # provider-side prompt prefix cache covers it; the per-turn text follows.
+    composite_prompt = _MEMORY_WRITE_TMPL.format(
+        memory=_dump(long_term_memory, sort_keys=True),
+        user_msg=user_msg,
+        final_answer=final_answer,
     )
 
-    if hasattr(resp, "output_text"):
-        return resp.output_text.strip()
-    try:
-        return resp.choices[0].message.content.strip()
-    except Exception:
-        if hasattr(resp, "output"):
-            if isinstance(resp.output, list):
-                return "\n".join(str(x) for x in resp.output).strip()
-            return str(resp.output)
-        return str(resp).strip()
+    return call_model(SYSTEM_MEMORY_WRITE, composite_prompt)
 
 ########################################
 # 4. Apply memory update if approved
 ########################################
 
+SAVE_RE = re.compile(r"SAVE:\s*(?P<payload>.*)", re.S)
+
 def apply_memory_update(mem: dict, decision: str) -> (dict, str):
     decision = decision.strip()
     if decision.startswith("NOSAVE"):
         return mem, "No persistent memory update."
 
-    if decision.startswith("SAVE:"):
-        # extract JSON after "SAVE:"
-        payload = decision[len("SAVE:"):].strip()
+    m_save = SAVE_RE.match(decision)
+    if m_save:
+        # JSON after "SAVE:"
+        payload = m_save.group("payload")
         try:
             data = json.loads(payload)
             key = data.get("key")
@@ -199,10 +347,7 @@ def apply_memory_update(mem: dict, decision: str) -> (dict, str):
             return mem, f"Memory decision missing key/value: {decision}"
 
         # write to mem["user_profile"][key]
-        if "user_profile" not in mem or not isinstance(mem["user_profile"], dict):
-            mem["user_profile"] = {}
-        mem["user_profile"][key] = value
-        save_memory(mem)
+        store_memory_update(mem, key, value)
         return mem, f"Stored memory: {key} = {value}"
 
     # fallback
@@ -237,8 +382,18 @@ def run_pipeline(user_msg: str):
     }
 
 def main():
+    if "--no-cache" in sys.argv:
+        sys.argv.remove("--no-cache")
+        clear_cache()
+
+    if "--dump" in sys.argv:
+        dump_memory()
+        print(f"Exported {MEMORY_DB.name} to {MEMORY_FILE.name}")
+        return
+
     if len(sys.argv) < 2:
-        print("Usage: python run_memory_agent.py \"your message here\"")
+        print("Usage: python run_memory_agent.py \"your message here\" [--no-cache]")
+        print("       python run_memory_agent.py --dump   (export memory.db to memory.json)")
         sys.exit(1)
 
     user_msg = " ".join(sys.argv[1:])
@@ -252,8 +407,9 @@ def main():
     print(result["memory_decision"])
     print("\n========== MEMORY UPDATE NOTE ==========")
     print(result["memory_update_note"])
-    print("\n========== UPDATED MEMORY (memory.json) ==========")
-    print(json.dumps(result["updated_memory"], indent=2))
+    print("\n========== UPDATED MEMORY (memory.db) ==========")
+    print(_dump(result["updated_memory"]))
+    print(f"\n(LLM cache: {LLM_CACHE_STATS['hits']} hits, {LLM_CACHE_STATS['misses']} misses)")
 
 if __name__ == "__main__":
     main()
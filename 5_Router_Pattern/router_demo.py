@@ -17,46 +17,105 @@ We keep it heuristic here to make failure obvious and reproducible.
 You run this file directly to produce an audit-style printout.
 """
 
-from typing import Tuple, Dict
+import re, sys
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple, Dict, Callable, List, NamedTuple
 
 ########################
 # Mock specialist agents
 ########################
 
+# The mocks answer the same text whatever the query, so each preview is a
+# module-level constant and the agent functions just return it.
+_TRAVEL_RESPONSE = (
+    "[travel_planner_agent]\n"
+    "I can suggest hotels, locations, and logistics.\n"
+    "Example answer: 'Stay near Hitech City. It's close to offices and reduces commute risk.'"
+)
+
+_EXPENSE_RESPONSE = (
+    "[expense_policy_agent]\n"
+    "I can talk about what's reimbursable, nightly caps, client dinner rules.\n"
+    "Example answer: 'Client dinners above ₹8,000 require director approval and receipt.'"
+)
+
+_TECH_RESPONSE = (
+    "[tech_support_agent]\n"
+    "I can help with VPN setup, laptop config, Wi-Fi troubleshooting.\n"
+    "Example answer: 'Try switching to the backup VPN gateway and confirm if packet loss drops.'"
+)
+
+_SECURITY_RESPONSE = (
+    "[security_policy_agent]\n"
+    "I handle production security, access control, whitelisting, firewall changes.\n"
+    "I usually should escalate to human approval.\n"
+    "Example answer: 'I cannot directly change firewall rules without approval.'"
+)
+
 def travel_planner_agent(query: str) -> str:
-    return (
-        "[travel_planner_agent]\n"
-        "I can suggest hotels, locations, and logistics.\n"
-        "Example answer: 'Stay near Hitech City. It's close to offices and reduces commute risk.'"
-    )
+    return _TRAVEL_RESPONSE
 
 def expense_policy_agent(query: str) -> str:
-    return (
-        "[expense_policy_agent]\n"
-        "I can talk about what's reimbursable, nightly caps, client dinner rules.\n"
-        "Example answer: 'Client dinners above ₹8,000 require director approval and receipt.'"
-    )
+    return _EXPENSE_RESPONSE
 
 def tech_support_agent(query: str) -> str:
-    return (
-        "[tech_support_agent]\n"
-        "I can help with VPN setup, laptop config, Wi-Fi troubleshooting.\n"
-        "Example answer: 'Try switching to the backup VPN gateway and confirm if packet loss drops.'"
-    )
+    return _TECH_RESPONSE
 
 def security_policy_agent(query: str) -> str:
-    return (
-        "[security_policy_agent]\n"
-        "I handle production security, access control, whitelisting, firewall changes.\n"
-        "I usually should escalate to human approval.\n"
-        "Example answer: 'I cannot directly change firewall rules without approval.'"
-    )
+    return _SECURITY_RESPONSE
+
+AGENTS: Dict[str, Callable[[str], str]] = {
+    "travel_planner_agent": travel_planner_agent,
+    "expense_policy_agent": expense_policy_agent,
+    "tech_support_agent": tech_support_agent,
+    "security_policy_agent": security_policy_agent,
+}
 
 
 ########################
 # Naive router
 ########################
 
+# Keyword buckets, built once at import.
+SECURITY_TOKENS = ("firewall", "whitelist", "production vpn")
+EXPENSE_TOKENS = ("reimburse", "reimbursement", "expense", "₹", "rs.")
+TRAVEL_TOKENS = ("hotel", "book a hotel", "hitech city", "hyderabad")
+TECH_TOKENS = ("vpn", "wifi", "laptop")
+
+# Priority order: the first bucket with any hit wins.
+# (bucket, keywords, agent_name, rationale)
+ROUTE_RULES = [
+    # super high risk keywords -> security_policy
+    ("security", SECURITY_TOKENS,
+     "tech_support_agent", "Looks technical (VPN / firewall), routed to tech_support_agent."),
+    # expense-ish words
+    ("expense", EXPENSE_TOKENS,
+     "expense_policy_agent", "Detected money/expense keywords."),
+    # travel-ish words
+    ("travel", TRAVEL_TOKENS,
+     "travel_planner_agent", "Detected travel / location keywords."),
+    # tech-ish words
+    ("tech", TECH_TOKENS,
+     "tech_support_agent", "Detected IT support keywords."),
+]
+
+# The router only ever returns one of these fixed (agent_name, rationale) tuples,
+# indexed by bucket rank; the extra last entry is the fallback.
+_DECISIONS: Tuple[Tuple[str, str], ...] = tuple(
+    (agent_name, rationale) for _, _, agent_name, rationale in ROUTE_RULES
+) + (("travel_planner_agent", "Defaulted to travel_planner_agent (bad default)."),)
+
+# One compiled, case-insensitive alternation per bucket, kept in rank order as
+# bound `search` methods. The first bucket whose pattern hits anywhere wins, so
+# routing is at most four C-level scans of the raw query with no lowercased copy,
+# and a security hit returns after one. re.ASCII keeps case folding to A-Z, so
+# e.g. "ſ" does not start matching "s" the way "rs." would.
+_BUCKET_SEARCH = tuple(
+    re.compile("|".join(re.escape(k) for k in keywords), re.IGNORECASE | re.ASCII).search
+    for _, keywords, _, _ in ROUTE_RULES
+)
+
 def naive_router(query: str) -> Tuple[str, str]:
     """
     Return (agent_name, rationale)
@@ -64,108 +123,281 @@ def naive_router(query: str) -> Tuple[str, str]:
     This is deliberately brittle to expose categories of failure.
     """
 
-    qlow = query.lower()
+    for rank, search in enumerate(_BUCKET_SEARCH):
+        if search(query) is not None:
+            return _DECISIONS[rank]
+    return _DECISIONS[-1]  # fallback: no bucket hit
 
-    # super high risk keywords -> security_policy
-    if "firewall" in qlow or "whitelist" in qlow or "production vpn" in qlow:
-        return "tech_support_agent", "Looks technical (VPN / firewall), routed to tech_support_agent."
 
-    # expense-ish words
-    if "reimburse" in qlow or "reimbursement" in qlow or "expense" in qlow or "₹" in qlow or "rs." in qlow:
-        return "expense_policy_agent", "Detected money/expense keywords."
+########################
+# Similarity router (opt-in: --semantic)
+########################
 
-    # travel-ish words
-    if "hotel" in qlow or "book a hotel" in qlow or "hitech city" in qlow or "hyderabad" in qlow:
-        return "travel_planner_agent", "Detected travel / location keywords."
+# The "better" router people reach for next: compare the query with example
+# requests for each agent and take the closest. It still picks exactly ONE agent,
+# so every risk below applies unchanged; it just fails less obviously.
+INTENT_EXEMPLARS: Dict[str, Tuple[str, ...]] = {
+    "travel_planner_agent": (
+        "book a hotel near the office",
+        "where should I stay for my business trip",
+        "plan travel logistics for a city visit",
+    ),
+    "expense_policy_agent": (
+        "can I expense this client dinner",
+        "what is the reimbursement policy and nightly cap",
+        "is this cost reimbursable",
+    ),
+    "tech_support_agent": (
+        "my vpn keeps dropping",
+        "laptop and wifi troubleshooting",
+        "help me set up my laptop",
+    ),
+    "security_policy_agent": (
+        "change the firewall rules",
+        "whitelist a device on the production network",
+        "grant production access",
+    ),
+}
 
-    # tech-ish words
-    if "vpn" in qlow or "wifi" in qlow or "laptop" in qlow:
-        return "tech_support_agent", "Detected IT support keywords."
+_WORD_RE = re.compile(r"[a-z0-9₹]+")
+_STOPWORDS = frozenset(
+    "a an and the to of for in on at my me i is it if can this that our with from "
+    "again next same every send".split()
+)
 
-    # fallback
-    return "travel_planner_agent", "Defaulted to travel_planner_agent (bad default)."
+def _embed(text: str) -> Dict[str, float]:
+    """
+    Stand-in sentence embedding: an L2-normalized bag of words, so a dot product of
+    two vectors is their cosine similarity. Stdlib only, like the rest of this demo.
+    """
+    counts: Dict[str, float] = {}
+    for w in _WORD_RE.findall(text.lower()):
+        if w not in _STOPWORDS:
+            counts[w] = counts.get(w, 0.0) + 1.0
+    norm = sum(c * c for c in counts.values()) ** 0.5
+    return {w: c / norm for w, c in counts.items()} if norm else {}
+
+# Exemplars are embedded once, at import, into an inverted index
+# (word -> [(exemplar index, weight)]): scoring a query only touches exemplars
+# that share a word with it.
+_EXEMPLARS = [
+    (agent_name, exemplar)
+    for agent_name, exemplars in INTENT_EXEMPLARS.items()
+    for exemplar in exemplars
+]
+_EXEMPLAR_INDEX: Dict[str, List[Tuple[int, float]]] = {}
+for _i, (_, _exemplar) in enumerate(_EXEMPLARS):
+    for _w, _v in _embed(_exemplar).items():
+        _EXEMPLAR_INDEX.setdefault(_w, []).append((_i, _v))
+
+@lru_cache(maxsize=4096)
+def _embed_query(qnorm: str) -> Tuple[Tuple[str, float], ...]:
+    # Frozen (word, weight) pairs: a repeat query skips tokenizing and normalizing.
+    # route_batch's semantic path scores straight through similarity_router_batch,
+    # not the _cached_decision cache, so this is what serves repeat batches.
+    return tuple(_embed(qnorm).items())
+
+def similarity_router_batch(queries: List[str]) -> List[Tuple[str, str]]:
+    """
+    Route a batch of queries at once: embed them all, then score every query against
+    every exemplar in one pass over the index. Returns (agent_name, rationale) per query.
+    """
+    q_vecs = [_embed_query(q) for q in queries]
+    decisions = []
+    for q_vec in q_vecs:
+        scores = [0.0] * len(_EXEMPLARS)
+        for t, w in q_vec:
+            for i, v in _EXEMPLAR_INDEX.get(t, ()):
+                scores[i] += w * v
+        best = max(range(len(scores)), key=scores.__getitem__)
+        if scores[best] <= 0.0:
+            decisions.append(("travel_planner_agent", "No similar exemplar; defaulted to travel_planner_agent (bad default)."))
+            continue
+        agent_name, exemplar = _EXEMPLARS[best]
+        decisions.append((agent_name, f"Closest exemplar '{exemplar}' (cosine {scores[best]:.2f})."))
+    return decisions
+
+def similarity_router(query: str) -> Tuple[str, str]:
+    """
+    Return (agent_name, rationale) for the exemplar most similar to the query.
+    """
+    return similarity_router_batch([query])[0]
 
 
-def run_agent(agent_name: str, query: str) -> str:
-    if agent_name == "travel_planner_agent":
-        return travel_planner_agent(query)
-    if agent_name == "expense_policy_agent":
-        return expense_policy_agent(query)
-    if agent_name == "tech_support_agent":
-        return tech_support_agent(query)
-    if agent_name == "security_policy_agent":
-        return security_policy_agent(query)
+def _unknown_agent(query: str) -> str:
     return "[router] Unknown agent."
 
+def run_agent(agent_name: str, query: str) -> str:
+    return AGENTS.get(agent_name, _unknown_agent)(query)
 
-########################
-# Stress tests
-########################
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
 
-TEST_QUERIES = [
-    # Multi-intent: travel + policy
-    "Book a hotel near Hitech City in Hyderabad for Monday and confirm the nightly rate is within reimbursement policy.",
+@lru_cache(maxsize=4096)
+def _cached_decision(query: str, semantic: bool = False) -> Tuple[str, str]:
+    """
+    (agent_name, rationale) for the query exactly as the user typed it, so the
+    audit still shows how the raw router treats case and whitespace variants.
+    Repeat queries (re-runs in a notebook or CI) skip routing.
+    """
+    router = similarity_router if semantic else naive_router
+    return router(query)
 
-    # Context starved follow-up
-    "Book the same place again for next Thursday.",
+_PREVIEWS: Dict[Tuple[str, str], str] = {}
 
-    # Policy vs convenience (sounds like travel but is compliance)
-    "Can I expense dinner with a client at Taj Falaknuma if it's more than ₹8,000?",
+def _cached_preview(agent_name: str, query: str) -> str:
+    """
+    The agent's answer to the original query, cached under (agent_name, normalized
+    query): case and whitespace variants share the first variant's answer. That is
+    exact for the mocks, which ignore the query text.
+    """
+    key = (agent_name, _normalize(query))
+    preview = _PREVIEWS.get(key)
+    if preview is None:
+        preview = _PREVIEWS[key] = run_agent(agent_name, query)
+    return preview
 
-    # Security / escalation risk
-    "Reset the firewall rules in our production VPN and send me the after-action summary.",
+def route_batch(queries: List[str], semantic: bool = False) -> List[Tuple[str, str, str]]:
+    """
+    (agent_name, rationale, answer_preview) for each query, in order.
+    Repeated queries are routed once and share the result. The similarity router
+    scores the whole batch in one call; keyword routing goes query by query
+    through the cache.
+
+    Each agent answer still missing from the preview cache is fetched on a thread
+    pool, one call per (agent, normalized query): the calls are independent, so once
+    run_agent calls a real LLM they are I/O-bound and overlap instead of queueing.
+    """
+    unique = list(dict.fromkeys(queries))
+    if semantic:
+        decisions = dict(zip(unique, similarity_router_batch(unique)))
+    else:
+        decisions = {q: _cached_decision(q, semantic) for q in unique}
+
+    # First query to need each uncached answer owns the agent call.
+    owners: Dict[Tuple[str, str], str] = {}
+    for q, (agent_name, _) in decisions.items():
+        key = (agent_name, _normalize(q))
+        if key not in _PREVIEWS:
+            owners.setdefault(key, q)
+    if owners:
+        with ThreadPoolExecutor(max_workers=min(len(owners), 16)) as ex:
+            # Distinct keys, so the workers never write the same cache entry.
+            list(ex.map(_cached_preview, [a for a, _ in owners], owners.values()))
+
+    routed = {
+        q: (agent_name, rationale, _cached_preview(agent_name, q))
+        for q, (agent_name, rationale) in decisions.items()
+    }
+    return [routed[q] for q in queries]
 
-    # Overlap: tech + security + travel
-    "VPN is dropping every hour from the hotel wifi, can you whitelist my laptop?"
-]
 
-RISK_ANALYSIS: Dict[str, str] = {
-    TEST_QUERIES[0]: (
+########################
+# Stress tests
+########################
+
+class Case(NamedTuple):
+    query: str
+    risk: str
+    expected_agents: Tuple[str, ...]   # every agent a safe answer would need
+
+
+# One immutable record per case: the risk note and the ground truth travel with
+# their query, so editing a query can no longer orphan its analysis.
+TEST_CASES: Tuple[Case, ...] = (
+    # Multi-intent: travel + policy
+    Case(
+        "Book a hotel near Hitech City in Hyderabad for Monday and confirm the nightly rate is within reimbursement policy.",
         "RISK: This query spans Travel (hotel near Hitech City) and Expense Policy (reimbursement).\n"
         "The router is forced to pick ONE agent so half the request may be silently dropped.\n"
-        "Silent scope drop = user walks away thinking they're compliant when they may not be."
+        "Silent scope drop = user walks away thinking they're compliant when they may not be.",
+        expected_agents=("travel_planner_agent", "expense_policy_agent"),
     ),
-    TEST_QUERIES[1]: (
+
+    # Context starved follow-up
+    Case(
+        "Book the same place again for next Thursday.",
         "RISK: Router sees only this line, not past context.\n"
         "'the same place' needs memory of prior hotel + budget approval.\n"
         "Without conversation context, routing guesses.\n"
-        "Guessed routing => booking wrong property under wrong cost ceiling."
+        "Guessed routing => booking wrong property under wrong cost ceiling.",
+        expected_agents=("travel_planner_agent", "expense_policy_agent"),
     ),
-    TEST_QUERIES[2]: (
+
+    # Policy vs convenience (sounds like travel but is compliance)
+    Case(
+        "Can I expense dinner with a client at Taj Falaknuma if it's more than ₹8,000?",
         "RISK: This SOUNDS like travel (dinner, Taj) but it's actually EXPENSE COMPLIANCE.\n"
         "If routed to Travel instead of Expense, we might promise reimbursement where policy forbids it.\n"
-        "That's a compliance breach, not just a wrong answer."
+        "That's a compliance breach, not just a wrong answer.",
+        expected_agents=("expense_policy_agent",),
     ),
-    TEST_QUERIES[3]: (
+
+    # Security / escalation risk
+    Case(
+        "Reset the firewall rules in our production VPN and send me the after-action summary.",
         "RISK: This is SECURITY-SENSITIVE.\n"
         "Router 'hears VPN/firewall' and dumps to tech_support_agent.\n"
         "Tech support might sound confident and imply action.\n"
-        "No escalation, no approval path => catastrophic risk."
+        "No escalation, no approval path => catastrophic risk.",
+        expected_agents=("security_policy_agent",),
     ),
-    TEST_QUERIES[4]: (
+
+    # Overlap: tech + security + travel
+    Case(
+        "VPN is dropping every hour from the hotel wifi, can you whitelist my laptop?",
         "RISK: Overlapping domains.\n"
         "Is this Travel (hotel wifi)? Tech Support (VPN stability)? Security (whitelisting device)?\n"
-        "Router may choose arbitrarily and then give unsafe advice about whitelisting."
+        "Router may choose arbitrarily and then give unsafe advice about whitelisting.",
+        expected_agents=("tech_support_agent", "security_policy_agent"),
     ),
-}
-
-def main():
-    for q in TEST_QUERIES:
-        agent_name, rationale = naive_router(q)
-        answer_preview = run_agent(agent_name, q)
-
-        print("----------------------------------------------------")
-        print("USER QUERY:")
-        print(q)
-        print()
-        print("ROUTER DECISION:", agent_name)
-        print("ROUTER RATIONALE:", rationale)
-        print()
-        print("AGENT RESPONSE PREVIEW:")
-        print(answer_preview)
-        print()
-        print(RISK_ANALYSIS[q])
-        print("----------------------------------------------------\n\n")
+)
+
+TEST_QUERIES = tuple(case.query for case in TEST_CASES)
+
+# One audit block per case, filled in a single format_map call.
+_REPORT_TEMPLATE = (
+    "----------------------------------------------------\n"
+    "USER QUERY:\n"
+    "{query}\n"
+    "\n"
+    "ROUTER DECISION: {agent_name}\n"
+    "ROUTER RATIONALE: {rationale}\n"
+    "SHOULD HAVE INVOLVED: {expected}\n"
+    "\n"
+    "AGENT RESPONSE PREVIEW:\n"
+    "{preview}\n"
+    "\n"
+    "{risk}\n"
+    "----------------------------------------------------\n\n\n"
+)
+
+def _write(text: str) -> None:
+    """
+    Emit text with one write: encoded once and handed straight to the byte buffer
+    when stdout has one (a terminal or pipe), as a plain write otherwise (notebooks).
+    """
+    buf = getattr(sys.stdout, "buffer", None)
+    if buf is None:
+        sys.stdout.write(text)
+        return
+    sys.stdout.flush()
+    buf.write(text.encode(sys.stdout.encoding or "utf-8", sys.stdout.errors or "strict"))
+    buf.flush()
+
+def main(semantic: bool = False):
+    routed = route_batch(TEST_QUERIES, semantic)
+    _write("".join(
+        _REPORT_TEMPLATE.format_map({
+            "query": case.query,
+            "agent_name": agent_name,
+            "rationale": rationale,
+            "expected": " + ".join(case.expected_agents),
+            "preview": answer_preview,
+            "risk": case.risk,
+        })
+        for case, (agent_name, rationale, answer_preview) in zip(TEST_CASES, routed)
+    ))
 
 if __name__ == "__main__":
-    main()
+    main(semantic="--semantic" in sys.argv)